@@ -6,7 +6,8 @@ import pandas as pd
 import math
 import sys
 
-from .utils import convert_dataframe
+from . import kernels
+from .utils import convert_dataframe, code_matrix, convert_dataframe_codes, memory_footprint
 
 
 DATAFRAME_ERROR = "Data input must be a pandas DataFrame"
@@ -17,29 +18,65 @@ def main_input_checks(df, labels):
         raise TypeError(DATAFRAME_ERROR)
 
 
+def bidisagreements_from_counts(counts):
+    # Bidisagreements matrix from the instance x label counts table:
+    # element (i, j) is the number of instances given exactly labels i and j
+    num_labels = counts.shape[1]
+    matrix = np.zeros((num_labels, num_labels))
+
+    present = counts > 0
+    bidisagreed = present[np.count_nonzero(present, axis=1) == 2]
+    pairs = np.nonzero(bidisagreed)[1].reshape(-1, 2)
+    np.add.at(matrix, (pairs[:, 0], pairs[:, 1]), 1)
+    np.add.at(matrix, (pairs[:, 1], pairs[:, 0]), 1)
+
+    return matrix
+
+
+def summary_from_counts(counts):
+    # BiDisagreements.agreements_summary() from the counts table, without printing
+    labelled = counts.sum(axis=1) > 1
+    num_distinct = np.count_nonzero(counts[labelled], axis=1)
+
+    full_agreement = int(np.sum(num_distinct == 1))
+    bidisagreement = int(np.sum(num_distinct == 2))
+    tridisagreement = int(np.sum(num_distinct == 3))
+    more = int(np.sum(num_distinct > 3))
+
+    return full_agreement, bidisagreement, tridisagreement, more
+
+
 class BiDisagreements():
     """
     Used for assessing absolute disagreements from manual annotations, with the
     ability to visualise bidisagreements, and see values of other disagreement
     quantities.
     """
-    def __init__(self, df):
+    def __init__(self, df, low_memory=False):
         """
         Parameters
         ----------
         annotator_labels: pandas dataframe, required
             Columns indexed by annotator name; rows indexed by labelled instance
+        low_memory: bool
+            If True, the labels are stored only as `codes`, an integer matrix
+            in the smallest dtype that fits (-1 if missing), instead of as
+            the object-dtype DataFrame `df`
         """
-        converted_data = convert_dataframe(df)
-        self.df = converted_data[0]
-        self.labels = converted_data[1]
-        self.data_dict = converted_data[2]
+        main_input_checks(df, None)
+        self.low_memory = low_memory
+        if low_memory:
+            self.codes, self.labels, self.data_dict = convert_dataframe_codes(df)
+            self.reference_length = self.codes.shape[0]
+        else:
+            converted_data = convert_dataframe(df)
+            self.df = converted_data[0]
+            self.labels = converted_data[1]
+            self.data_dict = converted_data[2]
+            self.reference_length = self.df.shape[0]
 
         n = len(self.labels)
         self.matrix = np.zeros((n, n))
-        self.reference_length = self.df.shape[0]
-
-        main_input_checks(self.df, self.labels)
 
         # Initialise the empty agreements dictionary (good format for access efficiency later)
         # Of the form { label1: {label1: num_disagreements, label2: num_disagreements, ... },
@@ -73,20 +110,15 @@ class BiDisagreements():
         more: int
             Number of instances labelled with 3 or more disagreements
         """
-        full_agreement, bidisagreement, tridisagreement, more = 0, 0, 0, 0
-        for idx, row in self.df.iterrows():
-            labels = [int(label) for label in row if not math.isnan(label)]
-            if len(labels) <= 1: # If no one labelled or if 1 person labelled
-                continue
-            num_disagreements = len(set(labels))
-            if num_disagreements == 1:
-                full_agreement += 1
-            elif num_disagreements == 2:
-                bidisagreement += 1
-            elif num_disagreements == 3:
-                tridisagreement += 1
-            else:
-                more += 1
+        codes = self.codes if self.low_memory else code_matrix(self.df)
+        # Built a block of instances at a time; instances where no one
+        # labelled or only 1 person labelled are skipped
+        summary = np.zeros(4, dtype=int)
+        for start in range(0, self.reference_length, kernels.CHUNK_SIZE):
+            counts = kernels.counts_table(codes[start:start + kernels.CHUNK_SIZE],
+                                          len(self.labels))
+            summary += summary_from_counts(counts)
+        full_agreement, bidisagreement, tridisagreement, more = (int(i) for i in summary)
 
         print("Number of instances with:")
         print("=========================")
@@ -107,6 +139,14 @@ class BiDisagreements():
     def labels_to_index(self):
         return self.data_dict
 
+    def memory_usage(self):
+        """
+        Returns
+        -------
+        dict of attribute name to approximate size in bytes, plus "total"
+        """
+        return memory_footprint(self)
+
     def agreements_matrix(self, normalise=False):
         """
         Parameters
@@ -119,15 +159,24 @@ class BiDisagreements():
             symmetric matrix of size (len(labels) x len(labels)), showing
             label disagreements between annotators
         """
-        for idx, row in self.df.iterrows():
-            labels = [int(label) for label in row if not math.isnan(label)]
-            k = set(labels)
-            if len(k) == 2:
-                k = list(k)
-                label1 = k[0]
-                label2 = k[1]
-                self.agreements_dict[label1][label2] += 1
-                self.agreements_dict[label2][label1] += 1
+        if self.low_memory:
+            num_labels = len(self.labels)
+            for start in range(0, self.reference_length, kernels.CHUNK_SIZE):
+                counts = kernels.counts_table(self.codes[start:start + kernels.CHUNK_SIZE],
+                                              num_labels)
+                block = bidisagreements_from_counts(counts)
+                for label1, label2 in zip(*np.nonzero(block)):
+                    self.agreements_dict[label1][label2] += int(block[label1][label2])
+        else:
+            for idx, row in self.df.iterrows():
+                labels = [int(label) for label in row if not math.isnan(label)]
+                k = set(labels)
+                if len(k) == 2:
+                    k = list(k)
+                    label1 = k[0]
+                    label2 = k[1]
+                    self.agreements_dict[label1][label2] += 1
+                    self.agreements_dict[label2][label1] += 1
 
         self.dict2matrix()
 
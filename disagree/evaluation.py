@@ -0,0 +1,196 @@
+"""
+Single-pass evaluation of several agreement statistics at once.
+
+See the disagree.evaluation.evaluate section of README.md for usage
+"""
+import contextlib
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+from . import kernels
+from .agreements import BiDisagreements, bidisagreements_from_counts, summary_from_counts
+from .metrics import Krippendorff, Metrics, fleiss_sums, fleiss_from_sums
+from .utils import convert_dataframe_codes
+
+
+DATAFRAME_ERROR = "Data input must be a pandas DataFrame"
+METRICS_ERROR = """Invalid metric requested.\n Possible options are
+(alpha_nominal, alpha_ordinal, alpha_interval, alpha_ratio, fleiss_kappa,
+agreements_summary, bidisagreements)"""
+
+# Intermediates each metric is derived from. Every intermediate is computed
+# at most once per call to evaluate(), in the order given by INTERMEDIATES.
+INTERMEDIATES = ["encoding", "counts", "coincidence"]
+METRIC_PLAN = {"alpha_nominal": ["encoding", "counts", "coincidence"],
+               "alpha_ordinal": ["encoding", "counts", "coincidence"],
+               "alpha_interval": ["encoding", "counts", "coincidence"],
+               "alpha_ratio": ["encoding", "counts", "coincidence"],
+               "fleiss_kappa": ["encoding", "counts"],
+               "agreements_summary": ["encoding", "counts"],
+               "bidisagreements": ["encoding", "counts"]}
+ALL_METRICS = list(METRIC_PLAN)
+
+
+def encode(df):
+    # Integer code matrix (smallest integer dtype, -1 for missing) and the
+    # label encoding
+    return convert_dataframe_codes(df)
+
+
+def delta_matrix(coincidence_matrix_sum, data_type):
+    # Matrix of Krippendorff's delta(v1, v2) over all pairs of label codes,
+    # matching Krippendorff.delta_* elementwise
+    num_labels = len(coincidence_matrix_sum)
+    v = np.arange(num_labels, dtype=float)
+    v1, v2 = v[:, None], v[None, :]
+
+    if data_type == "nominal":
+        return (v1 != v2).astype(float)
+    elif data_type == "ordinal":
+        cumulative = np.concatenate([[0.], np.cumsum(coincidence_matrix_sum)])
+        lo = np.minimum(v1, v2).astype(int)
+        hi = np.maximum(v1, v2).astype(int)
+        val = cumulative[hi + 1] - cumulative[lo]
+        val = val - (coincidence_matrix_sum[:, None] + coincidence_matrix_sum[None, :]) / 2.
+        return val ** 2
+    elif data_type == "interval":
+        return (v1 - v2) ** 2
+    elif data_type == "ratio":
+        with np.errstate(divide="ignore", invalid="ignore"):
+            delta = ((v1 - v2) / (v1 + v2)) ** 2
+        return np.nan_to_num(delta)
+
+
+def alpha_from_coincidence(coincidence_matrix, data_type):
+    # Krippendorff's alpha from a precomputed coincidence matrix
+    n = np.sum(coincidence_matrix, axis=0)
+    delta = delta_matrix(n, data_type)
+
+    observed_disagreement = np.sum(coincidence_matrix * delta) / 2.
+    expected_disagreement = np.sum(np.outer(n, n) * delta) / 2.
+
+    if expected_disagreement == 0:
+        return 1.
+
+    n_total = sum(n)
+
+    return 1. - (n_total - 1.) * (observed_disagreement / expected_disagreement)
+
+
+def individual_call(df, metric):
+    # The equivalent standalone call, each with its own class construction
+    if metric.startswith("alpha_"):
+        return Krippendorff(df).alpha(data_type=metric[len("alpha_"):])
+    elif metric == "fleiss_kappa":
+        return Metrics(df).fleiss_kappa()
+    elif metric == "agreements_summary":
+        with contextlib.redirect_stdout(io.StringIO()):
+            return BiDisagreements(df).agreements_summary()
+    elif metric == "bidisagreements":
+        return BiDisagreements(df).agreements_matrix()
+
+
+def evaluate(df, metrics=None, compare=False):
+    """
+    Computes several agreement statistics from one pass over the data.
+    The shared intermediates (label encoding, instance x label counts,
+    coincidence matrix) are each computed once and every requested metric
+    is derived from them. Labels are stored as in low-memory mode
+    (utils.convert_dataframe_codes), and the counts table is built
+    kernels.CHUNK_SIZE instances at a time, so it is never held in full.
+
+    Parameters
+    ----------
+    df: pandas DataFrame
+        rows are data instances, columns are annotator labels
+    metrics: list of str, optional
+        Any of ("alpha_nominal", "alpha_ordinal", "alpha_interval",
+        "alpha_ratio", "fleiss_kappa", "agreements_summary",
+        "bidisagreements"). Defaults to all of them.
+    compare: bool
+        If True, also time the equivalent individual calls
+        (e.g. Krippendorff(df).alpha(), Metrics(df).fleiss_kappa()) and
+        report the time saved
+
+    Returns
+    -------
+    report: dict
+        results: dict of metric name to value
+        data_dict: dict converting original labels to integer label codes
+        intermediates: list of intermediates that were computed
+        elapsed: float, seconds taken by evaluate()
+        individual_elapsed: float, seconds taken by the individual calls
+            (only if compare=True)
+        time_saved: float, individual_elapsed - elapsed (only if compare=True)
+    """
+    if not isinstance(df, pd.DataFrame):
+        raise TypeError(DATAFRAME_ERROR)
+
+    if metrics is None:
+        metrics = ALL_METRICS
+    for metric in metrics:
+        if metric not in METRIC_PLAN:
+            raise ValueError(METRICS_ERROR)
+
+    needed = set()
+    for metric in metrics:
+        needed.update(METRIC_PLAN[metric])
+    plan = [step for step in INTERMEDIATES if step in needed]
+
+    start = time.perf_counter()
+
+    codes, labels, data_dict = encode(df)
+    num_instances, num_labels = codes.shape[0], len(labels)
+
+    # Every per-block quantity below is additive over blocks of instances
+    coincidence_matrix = np.zeros((num_labels, num_labels))
+    sum_rater_agreement_extent = 0.
+    num_assignments = np.zeros(num_labels)
+    summary = np.zeros(4, dtype=int)
+    bidisagreements = np.zeros((num_labels, num_labels))
+    for start in range(0, num_instances, kernels.CHUNK_SIZE):
+        counts = kernels.counts_table(codes[start:start + kernels.CHUNK_SIZE], num_labels)
+        if "coincidence" in needed:
+            coincidence_matrix += kernels.coincidence_from_counts(counts)
+        if "fleiss_kappa" in metrics:
+            block_extent, block_assignments = fleiss_sums(counts)
+            sum_rater_agreement_extent += block_extent
+            num_assignments += block_assignments
+        if "agreements_summary" in metrics:
+            summary += summary_from_counts(counts)
+        if "bidisagreements" in metrics:
+            bidisagreements += bidisagreements_from_counts(counts)
+
+    results = {}
+    for metric in metrics:
+        if metric.startswith("alpha_"):
+            results[metric] = alpha_from_coincidence(coincidence_matrix,
+                                                     metric[len("alpha_"):])
+        elif metric == "fleiss_kappa":
+            results[metric] = fleiss_from_sums(sum_rater_agreement_extent,
+                                               num_assignments, num_instances)
+        elif metric == "agreements_summary":
+            results[metric] = tuple(int(i) for i in summary)
+        elif metric == "bidisagreements":
+            results[metric] = bidisagreements
+
+    elapsed = time.perf_counter() - start
+
+    report = {"results": results,
+              "data_dict": data_dict,
+              "intermediates": plan,
+              "elapsed": elapsed}
+
+    if compare:
+        start = time.perf_counter()
+        for metric in metrics:
+            individual_call(df, metric)
+        individual_elapsed = time.perf_counter() - start
+
+        report["individual_elapsed"] = individual_elapsed
+        report["time_saved"] = individual_elapsed - elapsed
+
+    return report
@@ -0,0 +1,192 @@
+"""
+Per-instance reductions over the label code matrix, with a pluggable backend.
+
+Every kernel takes `codes`, a numpy array of shape (num_instances x num_anns)
+holding integer label codes, either as floats with NaN where an annotator
+gave no label (utils.code_matrix) or as integers with -1 where an annotator
+gave no label (utils.convert_dataframe_codes). In both cases an entry is a
+label if and only if it is >= 0.
+
+Two backends are available:
+    numpy: vectorised NumPy (default, always available)
+    numba: JIT-compiled loops (requires numba to be installed)
+
+The backend is selected at runtime with set_backend().
+"""
+import numpy as np
+
+
+BACKEND_ERROR = """Invalid kernel backend.\n Possible options are
+(numpy, numba)"""
+NUMBA_ERROR = "The numba backend requires numba to be installed"
+
+BACKENDS = ["numpy", "numba"]
+
+# Number of instances processed at a time where a kernel would otherwise
+# build a (num_instances x num_labels) intermediate
+CHUNK_SIZE = 8192
+
+_backend = "numpy"
+_kernels = {}
+
+
+def _numpy_labels_per_instance(codes):
+    return np.count_nonzero(codes >= 0, axis=1)
+
+
+def _numpy_counts_table(codes, num_labels):
+    num_instances = codes.shape[0]
+    mask = codes >= 0
+    rows = np.nonzero(mask)[0]
+    flat = rows * num_labels + codes[mask].astype(np.int64)
+    counts = np.bincount(flat, minlength=num_instances * num_labels)
+    return counts.reshape(num_instances, num_labels)
+
+
+def _numpy_distinct_labels(codes, num_labels):
+    return np.count_nonzero(_numpy_counts_table(codes, num_labels), axis=1)
+
+
+def _numpy_coincidence_matrix(codes, num_labels):
+    coincidence_matrix = np.zeros((num_labels, num_labels))
+    for start in range(0, codes.shape[0], CHUNK_SIZE):
+        counts = _numpy_counts_table(codes[start:start + CHUNK_SIZE], num_labels)
+        coincidence_matrix += coincidence_from_counts(counts)
+    return coincidence_matrix
+
+
+def _load_numba():
+    # Compile the numba kernels on first use
+    try:
+        import numba
+    except ImportError:
+        raise ImportError(NUMBA_ERROR)
+
+    @numba.njit(cache=True)
+    def labels_per_instance(codes):
+        num_instances, num_anns = codes.shape
+        out = np.zeros(num_instances, dtype=np.int64)
+        for i in range(num_instances):
+            for j in range(num_anns):
+                if codes[i, j] >= 0:
+                    out[i] += 1
+        return out
+
+    @numba.njit(cache=True)
+    def counts_table(codes, num_labels):
+        num_instances, num_anns = codes.shape
+        out = np.zeros((num_instances, num_labels), dtype=np.int64)
+        for i in range(num_instances):
+            for j in range(num_anns):
+                if codes[i, j] >= 0:
+                    out[i, int(codes[i, j])] += 1
+        return out
+
+    @numba.njit(cache=True)
+    def distinct_labels(codes, num_labels):
+        # seen[c] == i + 1 marks label c as already counted for instance i
+        num_instances, num_anns = codes.shape
+        out = np.zeros(num_instances, dtype=np.int64)
+        seen = np.zeros(num_labels, dtype=np.int64)
+        for i in range(num_instances):
+            for j in range(num_anns):
+                if codes[i, j] >= 0:
+                    c = int(codes[i, j])
+                    if seen[c] != i + 1:
+                        seen[c] = i + 1
+                        out[i] += 1
+        return out
+
+    @numba.njit(cache=True)
+    def coincidence_matrix(codes, num_labels):
+        num_instances, num_anns = codes.shape
+        out = np.zeros((num_labels, num_labels))
+        labels = np.zeros(num_anns, dtype=np.int64)
+        for i in range(num_instances):
+            num_annotations = 0
+            for j in range(num_anns):
+                if codes[i, j] >= 0:
+                    labels[num_annotations] = int(codes[i, j])
+                    num_annotations += 1
+            if num_annotations < 2:
+                continue
+            weight = 1. / (num_annotations - 1)
+            for a in range(num_annotations):
+                for b in range(num_annotations):
+                    if a != b:
+                        out[labels[a], labels[b]] += weight
+        return out
+
+    return {"labels_per_instance": labels_per_instance,
+            "counts_table": counts_table,
+            "distinct_labels": distinct_labels,
+            "coincidence_matrix": coincidence_matrix}
+
+
+_kernels["numpy"] = {"labels_per_instance": _numpy_labels_per_instance,
+                     "counts_table": _numpy_counts_table,
+                     "distinct_labels": _numpy_distinct_labels,
+                     "coincidence_matrix": _numpy_coincidence_matrix}
+
+
+def set_backend(name):
+    """
+    Parameters
+    ----------
+    name: str, ("numpy", "numba")
+        Backend used by every kernel from now on
+    """
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(BACKEND_ERROR)
+    if name not in _kernels:
+        _kernels[name] = _load_numba()
+    _backend = name
+
+
+def get_backend():
+    return _backend
+
+
+def coincidence_from_counts(counts):
+    """
+    Krippendorff's coincidence matrix from the instance x label counts table.
+    Instances with fewer than two labels are not pairable and are dropped.
+    """
+    counts = counts.astype(float)
+    labels_per_instance = counts.sum(axis=1)
+    pairable = labels_per_instance > 1
+    counts = counts[pairable]
+    weights = 1. / (labels_per_instance[pairable] - 1.)
+
+    weighted = counts * weights[:, None]
+    coincidence_matrix = weighted.T @ counts
+    coincidence_matrix[np.diag_indices_from(coincidence_matrix)] -= weighted.sum(axis=0)
+
+    return coincidence_matrix
+
+
+def labels_per_instance(codes):
+    # Number of annotators that labelled each instance
+    return _kernels[_backend]["labels_per_instance"](codes)
+
+
+def counts_table(codes, num_labels):
+    """
+    Input: codes, (num_instances x num_anns) array of label codes, NaN or -1
+                  if missing
+           num_labels, number of distinct labels
+    Output: (num_instances x num_labels) array, n(i, c) = number of annotators
+            giving label c to instance i
+    """
+    return _kernels[_backend]["counts_table"](codes, num_labels)
+
+
+def distinct_labels(codes, num_labels):
+    # Number of distinct labels given to each instance
+    return _kernels[_backend]["distinct_labels"](codes, num_labels)
+
+
+def coincidence_matrix(codes, num_labels):
+    # Krippendorff's coincidence matrix, (num_labels x num_labels)
+    return _kernels[_backend]["coincidence_matrix"](codes, num_labels)
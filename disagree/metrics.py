@@ -3,13 +3,13 @@ See Jupyter notebooks for example usage
 """
 import numpy as np
 import pandas as pd
-import itertools
 import math
 import sys
 
 from collections import Counter
 from tqdm import tqdm
-from .utils import convert_dataframe
+from . import kernels
+from .utils import convert_dataframe, code_matrix, convert_dataframe_codes, memory_footprint
 
 from scipy.stats import pearsonr, kendalltau, spearmanr
 
@@ -18,6 +18,18 @@ DATAFRAME_ERROR = "Data input must be a pandas DataFrame"
 ANNOTATORS_ERROR = "Invalid choice of annotators.\n Possible options: "
 KRIPP_DATA_TYPE_ERROR = """Invalid 'data_type' input.\n Possible options are
 (nominal, ordinal, interval, ratio)"""
+KRIPP_NUMERIC_DATA_TYPE_ERROR = """Invalid 'data_type' input for numeric=True.\n
+Possible options are (interval, ratio)"""
+KRIPP_NUMERIC_ERROR = "Data input must be numeric when numeric=True"
+KRIPP_RATIO_NEGATIVE_ERROR = "Ratio data must be non-negative"
+
+# Number of (distinct value x distinct value) deltas held in memory at once
+# when computing the expected disagreement for numeric ratio data
+NUMERIC_BLOCK_SIZE = 2 ** 22
+# Trapezoid step for ratio_expected_quadrature() and the resulting bound on
+# the relative error of each pair's term, and so of the result
+RATIO_QUADRATURE_STEP = 0.25
+RATIO_QUADRATURE_ERROR = 1e-14
 
 
 def main_input_checks(df, labels):
@@ -26,12 +38,50 @@ def main_input_checks(df, labels):
 
 
 class Metrics():
-    def __init__(self, df):
+    """
+    Parameters
+    ----------
+    df: pandas DataFrame
+        rows are data instances, columns are annotator labels
+    low_memory: bool
+        If True, the labels are stored only as `codes`, an integer matrix in
+        the smallest dtype that fits (-1 if missing), instead of as the
+        object-dtype DataFrame `df`
+    """
+    def __init__(self, df, low_memory=False):
+        main_input_checks(df, None)
+        self.low_memory = low_memory
+        if low_memory:
+            self.codes, self.labels, self.data_dict = convert_dataframe_codes(df)
+            self.columns = df.columns
+            return
+
         converted_data = convert_dataframe(df)
         self.df = converted_data[0]
         self.labels = converted_data[1]
         self.data_dict = converted_data[2]
-        main_input_checks(self.df, self.labels)
+        self.columns = self.df.columns
+
+    def annotators_df(self, ann1, ann2):
+        # DataFrame holding (at least) the labels of ann1 and ann2,
+        # NaN if missing
+        if not self.low_memory:
+            return self.df
+
+        annotators_data = {}
+        for ann in (ann1, ann2):
+            col = self.codes[:, self.columns.get_loc(ann)]
+            annotators_data[ann] = np.where(col >= 0, col, np.nan)
+
+        return pd.DataFrame(annotators_data)
+
+    def memory_usage(self):
+        """
+        Returns
+        -------
+        dict of attribute name to approximate size in bytes, plus "total"
+        """
+        return memory_footprint(self)
 
     def joint_probability(self, ann1, ann2):
         """
@@ -50,11 +100,11 @@ class Metrics():
         -------
         Probability of the two annotators agreeing across all instances
         """
-        all_anns = self.df.columns
+        all_anns = self.columns
         if (ann1 not in all_anns or ann2 not in all_anns):
             raise ValueError(ANNOTATORS_ERROR + str(list(all_anns)))
 
-        df = self.df.dropna(subset=[ann1, ann2])
+        df = self.annotators_df(ann1, ann2).dropna(subset=[ann1, ann2])
         ann1_labels = df[ann1].values.tolist()
         ann2_labels = df[ann2].values.tolist()
         zipped = zip(ann1_labels, ann2_labels)
@@ -78,11 +128,11 @@ class Metrics():
         -------
         Cohen's kappa statistic between the two annotators
         """
-        all_anns = self.df.columns
+        all_anns = self.columns
         if (ann1 not in all_anns or ann2 not in all_anns):
             raise ValueError(ANNOTATORS_ERROR + str(list(all_anns)))
 
-        df = self.df.dropna(subset=[ann1, ann2])
+        df = self.annotators_df(ann1, ann2).dropna(subset=[ann1, ann2])
         ann1_labels = df[ann1].values.tolist()
         ann2_labels = df[ann2].values.tolist()
         num_instances = df.shape[0]
@@ -117,17 +167,9 @@ class Metrics():
         # fleiss_kappa() helper function
         # Convert df(rows=instances, cols=annotators)
         # to df(rows=instances, cols=labels)
-        n = len(self.labels)
-
-        df_rows = []
-        for idx, row in df.iterrows():
-            labels = [0] * n
-            for label in row:
-                if not math.isnan(label):
-                    labels[int(label)] += 1
-            df_rows.append(labels)
+        table = kernels.counts_table(code_matrix(df), len(self.labels))
 
-        return pd.DataFrame(df_rows, columns=self.labels)
+        return pd.DataFrame(table, columns=self.labels)
 
     def proportion_label_per_category(self, df):
         # fleiss_kappa() helper function
@@ -173,10 +215,8 @@ class Metrics():
         -------
         Fleiss' kappa statistic for all the annotators
         """
-        labels_per_instance = []
-        for i, row in self.df.iterrows():
-            num_nans = sum(math.isnan(k) for k in row)
-            labels_per_instance.append(len(row) - num_nans)
+        if self.low_memory:
+            return fleiss_kappa_codes(self.codes, len(self.labels))
 
         num_instances = self.df.shape[0]
         fleiss_df = self.df2table(self.df)
@@ -221,12 +261,13 @@ class Metrics():
         if not (measure == P or measure == S or measure == K):
             raise ValueError("Input measure '" + str(measure) + "' is invalid.\n Possible options: (pearson, kendall, spearman)")
 
-        all_anns = self.df.columns
+        all_anns = self.columns
         if (ann1 not in all_anns or ann2 not in all_anns):
             raise ValueError(ANNOTATORS_ERROR + str(list(all_anns)))
 
-        ann1_labels = self.df[ann1].values.tolist()
-        ann2_labels = self.df[ann2].values.tolist()
+        df = self.annotators_df(ann1, ann2)
+        ann1_labels = df[ann1].values.tolist()
+        ann2_labels = df[ann2].values.tolist()
 
         ann1_, ann2_ = [], []
         for i, label in enumerate(ann1_labels):
@@ -248,19 +289,180 @@ class Metrics():
             result = spearmanr(ann1_, ann2_)
             return (abs(result[0]), result[1])
 
+def fleiss_sums(counts):
+    """
+    Input: counts, (num_instances x num_labels) counts table for a block of
+           instances (kernels.counts_table)
+    Output: sum_rater_agreement_extent, float, sum over the instances of the
+                extent to which annotators agree on them
+            num_assignments, numpy array, number of labels given to each
+                category
+    Both are additive over blocks of instances.
+    """
+    num_assignments = counts.sum(axis=0)
+
+    total_labels = counts.sum(axis=1).astype(float)
+    summations = np.einsum("ij,ij->i", counts, counts) - total_labels
+    normalise = total_labels * (total_labels - 1.)
+    sum_rater_agreement_extent = np.sum(np.divide(summations, normalise,
+                                                  out=np.zeros_like(summations),
+                                                  where=normalise != 0))
+
+    return sum_rater_agreement_extent, num_assignments
+
+
+def fleiss_from_sums(sum_rater_agreement_extent, num_assignments, num_instances):
+    # Fleiss' kappa from the totals of fleiss_sums() over all instances
+    prop_labels_per_cat = num_assignments / np.sum(num_assignments)
+
+    mean_P = (1 / num_instances) * sum_rater_agreement_extent
+    mean_p = np.sum(prop_labels_per_cat ** 2)
+
+    if mean_p == 1:
+        return 1.
+
+    return (mean_P - mean_p) / (1 - mean_p)
+
+
+def fleiss_kappa_codes(codes, num_labels):
+    """
+    Fleiss' kappa from the label code matrix, building the instance x label
+    counts table kernels.CHUNK_SIZE instances at a time.
+
+    Input: codes, (num_instances x num_anns) array of label codes
+           num_labels, number of distinct labels
+    Output: Fleiss' kappa statistic for all the annotators
+    """
+    num_instances = codes.shape[0]
+    num_assignments = np.zeros(num_labels)
+    sum_rater_agreement_extent = 0.
+    for start in range(0, num_instances, kernels.CHUNK_SIZE):
+        counts = kernels.counts_table(codes[start:start + kernels.CHUNK_SIZE], num_labels)
+        block_extent, block_assignments = fleiss_sums(counts)
+        sum_rater_agreement_extent += block_extent
+        num_assignments += block_assignments
+
+    return fleiss_from_sums(sum_rater_agreement_extent, num_assignments, num_instances)
+
+
 def remove_nans(l):
-    return [int(i) for i in l if not math.isnan(i)]
+    l = np.asarray(l, dtype=float)
+    return l[~np.isnan(l)].astype(int).tolist()
 def coincidence_mat(df, labels):
-    coincidence_matrix = np.zeros((len(labels), len(labels)))
-    for row_num, labels in df.iterrows():
-        labels = remove_nans(list(labels))
-        num_annotations = len(labels)
-        perms = itertools.permutations(labels, 2)
-        for perm in perms:
-            i, j = perm[0], perm[1]
-            coincidence_matrix[i][j] += 1 / (num_annotations - 1)
+    return kernels.coincidence_matrix(code_matrix(df), len(labels))
+
+
+def delta_ratio_values(v1, v2):
+    # Elementwise ratio delta on raw values, 0 where v1 + v2 == 0
+    total = v1 + v2
+    diff = v1 - v2
+    safe_total = np.where(total == 0, 1., total)
+    return np.where(total == 0, 0., (diff / safe_total) ** 2)
 
-    return coincidence_matrix
+
+def ratio_expected_exact(distinct, counts):
+    # Sum of n_c * n_k * delta over pairs of distinct values c < k, in
+    # blocks rather than as a dense k x k matrix. O(k ** 2) time.
+    block = max(1, NUMERIC_BLOCK_SIZE // max(1, len(distinct)))
+    expected = 0.
+    for start in range(0, len(distinct), block):
+        v1 = distinct[start:start + block]
+        delta = delta_ratio_values(v1[:, None], distinct[None, :])
+        expected += counts[start:start + block] @ delta @ counts
+
+    return expected / 2.
+
+
+def ratio_expected_quadrature(distinct, counts):
+    """
+    Same as ratio_expected_exact() for non-negative values, in
+    O(k * num_nodes) time.
+
+    For a + b > 0, 1 / (a + b) ** 2 = integral over u of
+    exp(2u - (a + b) * exp(u)), so with w_c(u) = n_c * exp(-a_c * exp(u))
+        sum_{c < k} n_c n_k (a_c - a_k) ** 2 / (a_c + a_k) ** 2
+            = integral over u of exp(2u) * W(u) * V(u)
+    where W = sum_c w_c and V = sum_c w_c (a_c - m) ** 2 about the weighted
+    mean m. Every term is non-negative, so nothing cancels however closely
+    the values are clustered. The integral is evaluated with the trapezoid
+    rule on a grid of step RATIO_QUADRATURE_STEP, which gets every pair's
+    term to within RATIO_QUADRATURE_ERROR relative, and so the result too.
+    """
+    zero = distinct == 0
+    num_zero = np.sum(counts[zero])
+    distinct, counts = distinct[~zero], counts[~zero]
+    # Pairs of a zero and a positive value have delta 1
+    expected = num_zero * np.sum(counts)
+    if len(distinct) <= 1:
+        return expected
+
+    # The integrand for a + b = s is negligible outside
+    # u + log(s) in [-20, 4], for every s in [2 * min, 2 * max]
+    u = np.arange(-20. - np.log(2. * distinct[-1]),
+                  4. - np.log(2. * distinct[0]) + RATIO_QUADRATURE_STEP,
+                  RATIO_QUADRATURE_STEP)
+    block = max(1, NUMERIC_BLOCK_SIZE // len(distinct))
+    pairs = 0.
+    for start in range(0, len(u), block):
+        nodes = u[start:start + block]
+        weights = np.exp(-np.exp(nodes)[:, None] * distinct[None, :]) * counts[None, :]
+        total = weights.sum(axis=1)
+        nonzero = total > 0
+        weights, total, nodes = weights[nonzero], total[nonzero], nodes[nonzero]
+        mean = (weights @ distinct) / total
+        spread = np.einsum("ij,ij->i", weights, (distinct[None, :] - mean[:, None]) ** 2)
+        pairs += np.sum(np.exp(2. * nodes) * total * spread)
+
+    return expected + RATIO_QUADRATURE_STEP * pairs
+
+
+def numeric_disagreement(values, data_type):
+    """
+    Observed and expected disagreement for Krippendorff's alpha computed
+    directly from raw numeric values, without building a coincidence matrix.
+
+    Interval runs in O(n). Ratio runs in O(n log n + k * num_nodes), where
+    k is the number of distinct values (see ratio_expected_quadrature()),
+    and raises a ValueError if any value is negative.
+
+    Input: values, float numpy array (num_instances x num_anns), NaN if missing
+           data_type, ("interval", "ratio")
+    Output: observed_disagreement, expected_disagreement, n_total
+            (the same quantities as Krippendorff.disagreement() and the sum
+            of the coincidence matrix)
+    """
+    if data_type == "ratio" and np.any(values < 0):
+        raise ValueError(KRIPP_RATIO_NEGATIVE_ERROR)
+
+    labels_per_instance = np.count_nonzero(~np.isnan(values), axis=1)
+    pairable = labels_per_instance > 1
+    values = values[pairable]
+    m = labels_per_instance[pairable].astype(float)
+    pooled = values[~np.isnan(values)]
+    n_total = len(pooled)
+
+    if n_total == 0:
+        return 0., 0., n_total
+
+    if data_type == "interval":
+        # The sum of (x_i - x_j) ** 2 over the pairs of a set of m values is
+        # m times the sum of squared deviations from the mean
+        deviations = values - np.nanmean(values, axis=1)[:, None]
+        within = m * np.nansum(deviations ** 2, axis=1)
+        observed = np.sum(within / (m - 1.))
+        expected = n_total * np.sum((pooled - pooled.mean()) ** 2)
+    elif data_type == "ratio":
+        observed = 0.
+        num_anns = values.shape[1]
+        for j1 in range(1, num_anns):
+            for j2 in range(j1):
+                delta = delta_ratio_values(values[:, j1], values[:, j2])
+                observed += np.nansum(delta / (m - 1.))
+
+        distinct, counts = np.unique(pooled, return_counts=True)
+        expected = ratio_expected_quadrature(distinct, counts.astype(float))
+
+    return observed, expected, n_total
 
 
 class Krippendorff():
@@ -272,6 +474,17 @@ class Krippendorff():
     ----------
     df: pandas DataFrame
         rows are data instances, columns are annotator labels
+    numeric: bool
+        If True, labels are treated as raw numbers rather than categories.
+        Only the interval and ratio alphas are available, and they are
+        computed from the actual values without a coincidence matrix.
+        Interval is O(n). Ratio is O(n log n), with the expected
+        disagreement from a quadrature accurate to RATIO_QUADRATURE_ERROR
+        relative, and requires non-negative values.
+    low_memory: bool
+        If True, only the attributes needed for alpha() are kept: the labels
+        are stored as `codes`, an integer matrix in the smallest dtype that
+        fits (-1 if missing), and df, A and labels_per_instance are not kept.
 
     Initialised
     -----------
@@ -288,20 +501,51 @@ class Krippendorff():
         matrix computed in coincidence_mat()
     coincidence_matrix_sum: 1D numpy array
         sum of rows/columns in coincidence_matrix
+    values: numpy array
+        (numeric=True only, replaces the above) float matrix of the raw
+        labels, NaN if missing
     """
-    def __init__(self, df, use_tqdm=False):
+    def __init__(self, df, use_tqdm=False, numeric=False, low_memory=False):
         df_original = df
+        self.numeric = numeric
+        self.low_memory = low_memory
+        self.use_tqdm = use_tqdm
+        if numeric:
+            main_input_checks(df, None)
+            try:
+                self.values = df.values.astype(float)
+            except (TypeError, ValueError):
+                raise ValueError(KRIPP_NUMERIC_ERROR)
+            self.num_instances, self.num_anns = self.values.shape
+            if not low_memory:
+                # Raw values, not label codes: any non-NaN value is a label
+                self.labels_per_instance = np.count_nonzero(~np.isnan(self.values), axis=1).tolist()
+            return
+
+        if low_memory:
+            main_input_checks(df, None)
+            self.codes, self.labels, self.data_dict = convert_dataframe_codes(df)
+            self.num_instances, self.num_anns = self.codes.shape
+            self.coincidence_matrix = kernels.coincidence_matrix(self.codes, len(self.labels))
+            self.coincidence_matrix_sum = np.sum(self.coincidence_matrix, axis=0)
+            return
+
         self.df, self.labels, self.data_dict = convert_dataframe(df)
         self.num_instances, self.num_anns = self.df.shape
         self.A = self.df.values.transpose()
-        self.use_tqdm = use_tqdm
-        self.labels_per_instance = []
-        for i, row in self.df.iterrows():
-            self.labels_per_instance.append(len(row) - sum(math.isnan(k) for k in row))
+        self.labels_per_instance = kernels.labels_per_instance(code_matrix(self.df)).tolist()
 
         self.coincidence_matrix = coincidence_mat(self.df, self.labels)
         self.coincidence_matrix_sum = np.sum(self.coincidence_matrix, axis=0)
 
+    def memory_usage(self):
+        """
+        Returns
+        -------
+        dict of attribute name to approximate size in bytes, plus "total"
+        """
+        return memory_footprint(self)
+
     def delta_nominal(self, v1, v2):
         if v1 == v2:
             return 0
@@ -312,7 +556,7 @@ class Krippendorff():
         v1, v2 = int(v1), int(v2)
 
         val = 0
-        for g in range(v1, v2 + 1):
+        for g in range(min(v1, v2), max(v1, v2) + 1):
             element1 = self.coincidence_matrix_sum[g]
             val += element1
 
@@ -357,11 +601,24 @@ class Krippendorff():
         Parameters
         ----------
         data_type: str, ("nominal", "ordinal", "interval", "ratio")
+            Only ("interval", "ratio") if numeric=True
 
         Returns
         -------
         Krippendorff's alpha: float
         """
+        if self.numeric:
+            if not (data_type == "interval" or data_type == "ratio"):
+                raise ValueError(KRIPP_NUMERIC_DATA_TYPE_ERROR)
+
+            observed_disagreement, expected_disagreement, n_total = \
+                numeric_disagreement(self.values, data_type)
+
+            if expected_disagreement == 0:
+                return 1.
+
+            return 1. - (n_total - 1.) * (observed_disagreement / expected_disagreement)
+
         if not (data_type == "nominal" or data_type == "ordinal" or data_type == "interval" or data_type == "ratio"):
             raise ValueError(KRIPP_DATA_TYPE_ERROR)
 
@@ -0,0 +1,234 @@
+"""
+Asyncio-friendly access to the agreement statistics, with result caching.
+
+Computations run in an executor so they do not block the event loop.
+Results are kept in a size-bounded LRU cache keyed by a content fingerprint
+of the data and the metric parameters. Concurrent requests for the same key
+share a single computation.
+
+See the disagree.service.MetricService section of README.md for usage
+"""
+import asyncio
+import hashlib
+import functools
+import weakref
+
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .evaluation import evaluate
+from .metrics import Krippendorff, Metrics
+from .utils import convert_dataframe_codes
+
+
+DATAFRAME_ERROR = "Data input must be a pandas DataFrame"
+MAX_SIZE_ERROR = "max_size must be a positive integer"
+
+
+def fingerprint(df):
+    """
+    Fast content fingerprint of a DataFrame of annotator labels.
+
+    Frames whose columns are all plain numeric dtypes are hashed from their
+    raw values and dtypes. Any other frame is hashed from its encoded label
+    matrix (utils.convert_dataframe_codes): the integer code matrix and the
+    labels each code stands for, tagged with their type, so that e.g. 1 and
+    "1" are different labels. The annotator names are always included.
+    Frames with the same content give the same fingerprint.
+
+    Parameters
+    ----------
+    df: pandas DataFrame
+        rows are data instances, columns are annotator labels
+
+    Returns
+    -------
+    fingerprint: str
+        hex digest
+    """
+    if not isinstance(df, pd.DataFrame):
+        raise TypeError(DATAFRAME_ERROR)
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((df.shape, list(df.columns))).encode("utf-8"))
+
+    values = df.to_numpy()
+    if values.dtype.kind in "biuf":
+        dtypes = [dtype.str for dtype in df.dtypes]
+        digest.update(repr(("values", values.dtype.str, dtypes)).encode("utf-8"))
+        digest.update(np.ascontiguousarray(values).tobytes())
+        return digest.hexdigest()
+
+    codes, labels, data_dict = convert_dataframe_codes(df)
+    code_labels = [(type(k), k) for k in data_dict if k is not None]
+
+    digest.update(repr(("codes", codes.dtype.str, code_labels)).encode("utf-8"))
+    digest.update(codes.tobytes())
+
+    return digest.hexdigest()
+
+
+def compute_alpha(df, data_type, numeric):
+    return Krippendorff(df, numeric=numeric).alpha(data_type=data_type)
+
+
+def compute_fleiss_kappa(df):
+    return Metrics(df).fleiss_kappa()
+
+
+def compute_evaluate(df, metrics):
+    return evaluate(df, metrics=metrics)["results"]
+
+
+class MetricService():
+    """
+    Serves agreement statistics to asyncio code.
+
+    Parameters
+    ----------
+    max_size: int
+        Maximum number of results kept in the LRU cache
+    executor: concurrent.futures.Executor, optional
+        Where computations are run. Defaults to the event loop's default
+        executor (a thread pool). Pass a ProcessPoolExecutor to keep large
+        computations off the event loop's process entirely.
+    trust_identity: bool
+        If False (default), every request fingerprints its DataFrame, so a
+        DataFrame modified in place gets fresh results. If True, the
+        fingerprint of each DataFrame object is remembered for as long as
+        it is alive, and repeated requests with the same object skip the
+        hashing; such DataFrames must then never be modified in place.
+
+    Initialised
+    -----------
+    hits: int
+        number of requests answered from the cache
+    misses: int
+        number of requests that started a new computation
+    """
+    def __init__(self, max_size=128, executor=None, trust_identity=False):
+        if not isinstance(max_size, int) or max_size < 1:
+            raise ValueError(MAX_SIZE_ERROR)
+
+        self.max_size = max_size
+        self.executor = executor
+        self.trust_identity = trust_identity
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._in_flight = {}
+        # id(df) -> (weak reference to df, fingerprint), if trust_identity.
+        # DataFrames are not hashable, so a WeakKeyDictionary cannot be used.
+        self._fingerprints = {}
+
+    async def fingerprint(self, df):
+        # fingerprint(df), computed in the executor, once per DataFrame
+        # object if trust_identity
+        if not isinstance(df, pd.DataFrame):
+            raise TypeError(DATAFRAME_ERROR)
+
+        loop = asyncio.get_running_loop()
+        if not self.trust_identity:
+            return await loop.run_in_executor(self.executor, fingerprint, df)
+
+        key = id(df)
+        if key in self._fingerprints:
+            ref, data_key = self._fingerprints[key]
+            if ref() is df:
+                return data_key
+
+        data_key = await loop.run_in_executor(self.executor, fingerprint, df)
+
+        fingerprints = self._fingerprints
+        def forget(ref, key=key):
+            if key in fingerprints and fingerprints[key][0] is ref:
+                del fingerprints[key]
+        self._fingerprints[key] = (weakref.ref(df, forget), data_key)
+
+        return data_key
+
+    async def compute(self, df, name, func, **params):
+        """
+        Returns func(df, **params), computed at most once per distinct
+        (data, name, params) while it stays in the cache.
+
+        Parameters
+        ----------
+        df: pandas DataFrame
+            rows are data instances, columns are annotator labels
+        name: str
+            Name of the metric, part of the cache key
+        func: callable
+            Called as func(df, **params) in the executor. Must be picklable
+            if the executor is a ProcessPoolExecutor.
+        params: keyword arguments
+            Metric parameters, part of the cache key. Must be hashable.
+
+        Returns
+        -------
+        The result of func(df, **params). Cached results are shared between
+        callers, so they should not be modified in place.
+        """
+        data_key = await self.fingerprint(df)
+        key = (data_key, name, tuple(sorted(params.items())))
+
+        if key in self._cache:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        if key in self._in_flight:
+            self.hits += 1
+            return await asyncio.shield(self._in_flight[key])
+
+        self.misses += 1
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor,
+                                      functools.partial(func, df, **params))
+        self._in_flight[key] = future
+        try:
+            result = await asyncio.shield(future)
+        finally:
+            del self._in_flight[key]
+
+        self._cache[key] = result
+        if len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+        return result
+
+    async def alpha(self, df, data_type="nominal", numeric=False):
+        """
+        Krippendorff's alpha, see disagree.metrics.Krippendorff.alpha
+        """
+        return await self.compute(df, "alpha", compute_alpha,
+                                  data_type=data_type, numeric=numeric)
+
+    async def fleiss_kappa(self, df):
+        """
+        Fleiss' kappa, see disagree.metrics.Metrics.fleiss_kappa
+        """
+        return await self.compute(df, "fleiss_kappa", compute_fleiss_kappa)
+
+    async def evaluate(self, df, metrics=None):
+        """
+        Results of disagree.evaluation.evaluate, as a dict of metric name
+        to value
+        """
+        if metrics is not None:
+            metrics = tuple(metrics)
+        return await self.compute(df, "evaluate", compute_evaluate,
+                                  metrics=metrics)
+
+    def cache_info(self):
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._cache),
+                "max_size": self.max_size}
+
+    def clear(self):
+        self._cache.clear()
+        self.hits = 0
+        self.misses = 0
@@ -1,15 +1,10 @@
 import pandas as pd
 import numpy as np
+import sys
 
 def count_nans(lst):
     # Count the number of NaNs in a list.
-    num_nans = 0
-    null_list = list(pd.isnull(lst))
-    for is_null in null_list:
-        if is_null:
-            num_nans += 1
-
-    return num_nans
+    return int(np.count_nonzero(pd.isnull(lst)))
 
 def append_one_nan(old_lst, new_lst):
     old_null_list = list(pd.isnull(old_lst))
@@ -42,6 +37,13 @@ def flexible_data(df):
         if not is_null:
             unique_data_ex_none.append(unique_data[i])
 
+    # Number the labels in value order, so that codes are deterministic and
+    # respect the scale for ordinal, interval and ratio data
+    try:
+        unique_data_ex_none = sorted(unique_data_ex_none)
+    except TypeError:
+        pass
+
     new_unique = unique_data_ex_none + [None]
     numbered_labels = [i for i in range(len(unique_data_ex_none))]
 
@@ -77,3 +79,84 @@ def convert_dataframe(df):
     new_data = pd.DataFrame(new_data)
 
     return new_data, numbered_labels, data_dict
+
+def code_matrix(df):
+    """
+    Input: df, output of convert_dataframe()
+    Output: float numpy array of the integer label codes, NaN if missing
+    """
+    return df.values.astype(float)
+
+
+def smallest_code_dtype(num_labels):
+    # Smallest signed integer dtype holding codes 0..num_labels-1 and -1
+    for dtype in (np.int8, np.int16, np.int32):
+        if num_labels - 1 <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def convert_dataframe_codes(df):
+    """
+    Low-memory alternative to convert_dataframe(), which never builds a
+    list of every label or an object-dtype copy of the data.
+
+    Input: df, with n(i,j)=jth annotation for ith data point
+    Output: codes, numpy array (num_instances x num_anns) of integer labels
+                   indexed from zero, -1 if missing, in the smallest integer
+                   dtype that fits
+            numbered_labels, list of integer labels from 0
+            data_dict, dict converting original labels to new integer labels
+    """
+    unique_data = set()
+    for idx, col in df.items():
+        unique_data.update(pd.unique(col[col.notna()]))
+
+    unique_data = list(unique_data)
+    # Number the labels in value order, as in flexible_data()
+    try:
+        unique_data = sorted(unique_data)
+    except TypeError:
+        pass
+
+    numbered_labels = [i for i in range(len(unique_data))]
+    data_dict = { }
+    for name, i in zip(unique_data, numbered_labels):
+        data_dict[name] = int(i)
+    data_dict[None] = None
+
+    index = pd.Index(unique_data)
+    codes = np.empty(df.shape, dtype=smallest_code_dtype(len(unique_data)))
+    for j, (idx, col) in enumerate(df.items()):
+        codes[:, j] = index.get_indexer(col)
+
+    return codes, numbered_labels, data_dict
+
+
+def memory_footprint(obj):
+    """
+    Input: obj, any object, e.g. Krippendorff, Metrics or BiDisagreements
+    Output: dict of attribute name to approximate size in bytes, including
+            the objects it holds (arrays, DataFrames, lists), plus "total".
+            Attributes sharing memory are each counted in full.
+    """
+    footprint = {}
+    for name, value in vars(obj).items():
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            size = int(np.sum(value.memory_usage(index=True, deep=True)))
+        elif isinstance(value, np.ndarray):
+            size = value.nbytes
+            if value.dtype == object:
+                size += sum(sys.getsizeof(i) for i in value.flat)
+        elif isinstance(value, (list, tuple, set)):
+            size = sys.getsizeof(value) + sum(sys.getsizeof(i) for i in value)
+        elif isinstance(value, dict):
+            size = sys.getsizeof(value) + sum(sys.getsizeof(k) + sys.getsizeof(v)
+                                              for k, v in value.items())
+        else:
+            size = sys.getsizeof(value)
+        footprint[name] = size
+
+    footprint["total"] = sum(footprint.values())
+
+    return footprint
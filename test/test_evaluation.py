@@ -0,0 +1,93 @@
+import unittest
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+
+from disagree import evaluation, kernels
+from disagree.agreements import BiDisagreements
+from disagree.metrics import Krippendorff, Metrics
+
+test_annotations = {"a": [None, None, None, None, None, 2, 3, 0, 1, 0, 0, 2, 2, None, 2],
+                    "b": [0, None, 1, 0, 2, 2, 3, 2, None, None, None, None, None, None, None],
+                    "c": [None, None, 1, 0, 2, 3, 3, None, 1, 0, 0, 2, 2, None, 3]}
+
+data_nominal_missing = {"a": [1, 2, 3, 3, 2, 1, 4, 1, 2, None, None, None],
+                        "b": [1, 2, 3, 3, 2, 2, 4, 1, 2, 5, None, 3],
+                        "c": [None, 3, 3, 3, 2, 3, 4, 2, 2, 5, 1, None],
+                        "d": [1, 2, 3, 3, 2, 4, 4, 1, 2, 5, 1, None]}
+
+df_test = pd.DataFrame(test_annotations)
+df_nominal_missing = pd.DataFrame(data_nominal_missing)
+
+
+class TestEvaluate(unittest.TestCase):
+    """
+    Tests for disagree.evaluation.evaluate, checked against the individual
+    class-based calls
+    """
+    def check_against_individual(self, df):
+        report = evaluation.evaluate(df)
+        results = report["results"]
+
+        for data_type in ("nominal", "ordinal", "interval", "ratio"):
+            alpha = Krippendorff(df).alpha(data_type=data_type)
+            self.assertAlmostEqual(results["alpha_" + data_type], alpha)
+
+        self.assertAlmostEqual(results["fleiss_kappa"], Metrics(df).fleiss_kappa())
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary = BiDisagreements(df).agreements_summary()
+        self.assertEqual(results["agreements_summary"], summary)
+
+        matrix = BiDisagreements(df).agreements_matrix()
+        self.assertTrue(np.array_equal(results["bidisagreements"], matrix))
+
+    def test_matches_individual_calls(self):
+        self.check_against_individual(df_test)
+
+    def test_matches_individual_calls_nominal_missing(self):
+        self.check_against_individual(df_nominal_missing)
+
+    def test_coincidence_matches_krippendorff(self):
+        codes, labels, _ = evaluation.encode(df_test)
+        counts = kernels.counts_table(codes, len(labels))
+        coincidence_matrix = kernels.coincidence_from_counts(counts)
+        self.assertTrue(np.allclose(coincidence_matrix,
+                                    Krippendorff(df_test).coincidence_matrix))
+
+    def test_chunked_counts_match(self):
+        # Counts built a few instances at a time give the same results
+        expected = evaluation.evaluate(df_nominal_missing)["results"]
+        chunk_size = kernels.CHUNK_SIZE
+        kernels.CHUNK_SIZE = 5
+        try:
+            results = evaluation.evaluate(df_nominal_missing)["results"]
+        finally:
+            kernels.CHUNK_SIZE = chunk_size
+
+        for metric in expected:
+            self.assertTrue(np.allclose(results[metric], expected[metric]), metric)
+
+    def test_plan_skips_unneeded_intermediates(self):
+        report = evaluation.evaluate(df_test, metrics=["fleiss_kappa"])
+        self.assertEqual(report["intermediates"], ["encoding", "counts"])
+        self.assertEqual(list(report["results"]), ["fleiss_kappa"])
+
+    def test_compare_reports_time_saved(self):
+        report = evaluation.evaluate(df_test, compare=True)
+        self.assertAlmostEqual(report["time_saved"],
+                               report["individual_elapsed"] - report["elapsed"])
+
+    def test_invalid_metric(self):
+        with self.assertRaises(ValueError):
+            evaluation.evaluate(df_test, metrics=["alpha_spherical"])
+
+    def test_invalid_input(self):
+        with self.assertRaises(TypeError):
+            evaluation.evaluate(test_annotations)
+
+
+if __name__ == "__main__":
+    unittest.main()
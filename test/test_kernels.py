@@ -0,0 +1,102 @@
+import unittest
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from disagree import kernels
+from disagree.metrics import remove_nans
+from disagree.utils import count_nans
+
+try:
+    import numba
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+NUM_LABELS = 6
+
+rng = np.random.RandomState(0)
+codes = rng.randint(0, NUM_LABELS, size=(200, 7)).astype(float)
+codes[rng.rand(*codes.shape) < 0.3] = np.nan
+
+
+def reference_coincidence_matrix(codes, num_labels):
+    # The original per-instance permutation expansion
+    coincidence_matrix = np.zeros((num_labels, num_labels))
+    for row in codes:
+        labels = [int(i) for i in row if not np.isnan(i)]
+        for i, j in itertools.permutations(labels, 2):
+            coincidence_matrix[i][j] += 1 / (len(labels) - 1)
+    return coincidence_matrix
+
+
+def run_kernels():
+    return {"labels_per_instance": kernels.labels_per_instance(codes),
+            "counts_table": kernels.counts_table(codes, NUM_LABELS),
+            "distinct_labels": kernels.distinct_labels(codes, NUM_LABELS),
+            "coincidence_matrix": kernels.coincidence_matrix(codes, NUM_LABELS)}
+
+
+class TestKernels(unittest.TestCase):
+    """
+    Tests for disagree.kernels, checking every backend against the
+    per-instance Python reference and against each other
+    """
+    def tearDown(self):
+        kernels.set_backend("numpy")
+
+    def test_numpy_backend_matches_reference(self):
+        kernels.set_backend("numpy")
+        results = run_kernels()
+
+        nonmissing = [[int(i) for i in row if not np.isnan(i)] for row in codes]
+        self.assertEqual(results["labels_per_instance"].tolist(),
+                         [len(row) for row in nonmissing])
+        self.assertEqual(results["distinct_labels"].tolist(),
+                         [len(set(row)) for row in nonmissing])
+        self.assertTrue(np.allclose(results["coincidence_matrix"],
+                                    reference_coincidence_matrix(codes, NUM_LABELS)))
+
+    @unittest.skipUnless(HAS_NUMBA, "numba is not installed")
+    def test_numba_backend_matches_numpy(self):
+        kernels.set_backend("numpy")
+        expected = run_kernels()
+        kernels.set_backend("numba")
+        self.assertEqual(kernels.get_backend(), "numba")
+        results = run_kernels()
+
+        for name in expected:
+            self.assertTrue(np.allclose(results[name], expected[name]), name)
+
+    def test_integer_codes_match_float_codes(self):
+        int_codes = np.where(np.isnan(codes), -1, codes).astype(np.int8)
+        for backend in (["numpy", "numba"] if HAS_NUMBA else ["numpy"]):
+            kernels.set_backend(backend)
+            expected = run_kernels()
+            results = {"labels_per_instance": kernels.labels_per_instance(int_codes),
+                       "counts_table": kernels.counts_table(int_codes, NUM_LABELS),
+                       "distinct_labels": kernels.distinct_labels(int_codes, NUM_LABELS),
+                       "coincidence_matrix": kernels.coincidence_matrix(int_codes, NUM_LABELS)}
+            for name in expected:
+                self.assertTrue(np.allclose(results[name], expected[name]), name)
+
+    @unittest.skipIf(HAS_NUMBA, "numba is installed")
+    def test_numba_backend_unavailable(self):
+        with self.assertRaises(ImportError):
+            kernels.set_backend("numba")
+        self.assertEqual(kernels.get_backend(), "numpy")
+
+    def test_invalid_backend(self):
+        with self.assertRaises(ValueError):
+            kernels.set_backend("cuda")
+
+    def test_remove_nans(self):
+        self.assertEqual(remove_nans([1., np.nan, 3., None]), [1, 3])
+
+    def test_count_nans(self):
+        self.assertEqual(count_nans(["a", None, 2, np.nan]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,13 @@
 import sys
 import unittest
+import itertools
+import numpy as np
 import pandas as pd
 
 sys.path.append("..")
 from disagree.metrics import Krippendorff
 from disagree.metrics import Metrics
+from disagree.metrics import ratio_expected_exact, ratio_expected_quadrature
 
 test_annotations = {"a": [None, None, None, None, None, 2, 3, 0, 1, 0, 0, 2, 2, None, 2],
                     "b": [0, None, 1, 0, 2, 2, 3, 2, None, None, None, None, None, None, None],
@@ -56,9 +59,19 @@ kripp_binary = Krippendorff(df_binary)
 kripp_nominal_full = Krippendorff(df_nominal_full)
 kripp_nominal_missing = Krippendorff(df_nominal_missing)
 
+kripp_numeric_test = Krippendorff(df_test, numeric=True)
+# Same data on a non-contiguous scale: interval alpha is unchanged
+kripp_numeric_scaled = Krippendorff(df_test * 10. + 5., numeric=True)
+
+kripp_lean_test = Krippendorff(df_test, low_memory=True)
+kripp_lean_nominal_full = Krippendorff(df_nominal_full, low_memory=True)
+
 mets = Metrics(df_test)
 mets_cohens = Metrics(df_cohens)
 mets_fleiss = Metrics(df_fleiss)
+mets_lean = Metrics(df_test, low_memory=True)
+mets_lean_cohens = Metrics(df_cohens, low_memory=True)
+mets_lean_fleiss = Metrics(df_fleiss, low_memory=True)
 
 
 class TestMetrics(unittest.TestCase):
@@ -87,6 +100,17 @@ class TestMetrics(unittest.TestCase):
         alpha = float("{:.3f}".format(alpha))
         self.assertTrue(alpha == 0.743)
 
+    def test_kripps_alpha_value_with_ordinal_data(self):
+        # Ordinal alpha for Krippendorff's 4-coder, 12-unit example
+        # (same data as the nominal missing data test)
+        alpha = kripp_nominal_missing.alpha(data_type="ordinal")
+        alpha = float("{:.3f}".format(alpha))
+        self.assertTrue(alpha == 0.815)
+
+        alpha = kripp_nominal_missing.alpha(data_type="interval")
+        alpha = float("{:.3f}".format(alpha))
+        self.assertTrue(alpha == 0.849)
+
     def test_kripps_alpha_value_with_interval_data(self):
         # Test the final value of kripps alpha, from the Wikipedia example
         # https://en.wikipedia.org/wiki/Krippendorff%27s_alpha
@@ -94,6 +118,109 @@ class TestMetrics(unittest.TestCase):
         alpha = float("{:.3f}".format(alpha))
         self.assertTrue(alpha == 0.811)
 
+    def test_kripps_alpha_numeric_interval(self):
+        alpha = kripp_numeric_test.alpha(data_type="interval")
+        alpha = float("{:.3f}".format(alpha))
+        self.assertTrue(alpha == 0.811)
+
+        alpha = kripp_numeric_scaled.alpha(data_type="interval")
+        alpha = float("{:.3f}".format(alpha))
+        self.assertTrue(alpha == 0.811)
+
+    def test_kripps_alpha_numeric_ratio_matches_categorical(self):
+        # Label codes equal the raw values for this data
+        alpha = kripp_numeric_test.alpha(data_type="ratio")
+        self.assertAlmostEqual(alpha, kripp_test.alpha(data_type="ratio"))
+
+    def ratio_alpha_brute_force(self, values):
+        # Brute force over all pairs of values
+        def delta(a, b):
+            return ((a - b) / (a + b)) ** 2
+
+        observed, pooled = 0., []
+        for row in values:
+            row = row[~np.isnan(row)]
+            if len(row) < 2:
+                continue
+            pooled += list(row)
+            observed += sum(delta(a, b) for a, b in itertools.combinations(row, 2)) / (len(row) - 1)
+        expected = sum(delta(a, b) for a, b in itertools.combinations(pooled, 2))
+
+        return 1. - (len(pooled) - 1.) * observed / expected
+
+    def test_kripps_alpha_numeric_ratio_continuous(self):
+        # Continuous ratings
+        rng = np.random.RandomState(0)
+        values = rng.gamma(2., size=(40, 4)) + rng.rand(40, 1) * 5
+        values[rng.rand(40, 4) < 0.2] = np.nan
+
+        alpha = Krippendorff(pd.DataFrame(values), numeric=True).alpha(data_type="ratio")
+        self.assertAlmostEqual(alpha, self.ratio_alpha_brute_force(values))
+
+    def test_kripps_alpha_numeric_ratio_clustered(self):
+        # Large values a few units apart, where every delta is tiny
+        rng = np.random.RandomState(2)
+        for centre in (1e6, 1e8):
+            values = np.round(centre + rng.randn(300, 3) * 3 + rng.randn(300, 1) * 5)
+
+            alpha = Krippendorff(pd.DataFrame(values), numeric=True).alpha(data_type="ratio")
+            self.assertAlmostEqual(alpha, self.ratio_alpha_brute_force(values))
+
+    def test_kripps_alpha_numeric_ratio_quadrature(self):
+        rng = np.random.RandomState(1)
+        for values in (rng.gamma(2., size=3000),
+                       np.r_[rng.gamma(.3, size=3000) * 1e4, 0., 0.],
+                       rng.randint(0, 50, 3000).astype(float),
+                       np.round(1e8 + rng.randn(3000) * 3)):
+            distinct, counts = np.unique(values, return_counts=True)
+            counts = counts.astype(float)
+            self.assertAlmostEqual(ratio_expected_quadrature(distinct, counts) /
+                                   ratio_expected_exact(distinct, counts), 1.)
+
+    def test_kripps_alpha_numeric_no_pairable_instances(self):
+        # Every instance has at most one label
+        df = pd.DataFrame({"a": [1., None, 3.], "b": [None, 2., None]})
+        for data_type in ("interval", "ratio"):
+            alpha = Krippendorff(df, numeric=True).alpha(data_type=data_type)
+            self.assertTrue(alpha == 1.)
+
+    def test_kripps_alpha_numeric_ratio_negative(self):
+        df = pd.DataFrame({"a": [1., 2., 3.], "b": [1.5, -2., None]})
+        with self.assertRaises(ValueError):
+            Krippendorff(df, numeric=True).alpha(data_type="ratio")
+
+    def test_numeric_labels_per_instance_negative_values(self):
+        df = pd.DataFrame({"a": [-1., -2., 3.], "b": [-1.5, 2., None]})
+        self.assertEqual(Krippendorff(df, numeric=True).labels_per_instance, [2, 2, 1])
+
+    def test_kripps_alpha_numeric_invalid_data_type(self):
+        with self.assertRaises(ValueError):
+            kripp_numeric_test.alpha(data_type="nominal")
+
+    def test_kripps_alpha_low_memory(self):
+        for data_type in ("nominal", "ordinal", "interval", "ratio"):
+            self.assertAlmostEqual(kripp_lean_test.alpha(data_type=data_type),
+                                   kripp_test.alpha(data_type=data_type))
+        self.assertAlmostEqual(kripp_lean_nominal_full.alpha(data_type="nominal"),
+                               kripp_nominal_full.alpha(data_type="nominal"))
+
+    def test_low_memory_storage(self):
+        self.assertEqual(kripp_lean_test.codes.dtype, np.int8)
+        self.assertFalse(hasattr(kripp_lean_test, "df"))
+        self.assertFalse(hasattr(mets_lean, "df"))
+        self.assertLess(kripp_lean_test.memory_usage()["total"],
+                        kripp_test.memory_usage()["total"])
+        self.assertLess(mets_lean.memory_usage()["total"],
+                        mets.memory_usage()["total"])
+
+    def test_metrics_low_memory(self):
+        self.assertEqual(mets_lean.joint_probability(ann1="a", ann2="b"),
+                         mets.joint_probability(ann1="a", ann2="b"))
+        self.assertAlmostEqual(mets_lean_cohens.cohens_kappa(ann1="a", ann2="b"),
+                               mets_cohens.cohens_kappa(ann1="a", ann2="b"))
+        self.assertAlmostEqual(mets_lean_fleiss.fleiss_kappa(),
+                               mets_fleiss.fleiss_kappa())
+
     def test_joint_probability_value(self):
         jp = mets.joint_probability(ann1="a", ann2="b")
         actual_jp = 2 / 3
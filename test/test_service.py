@@ -0,0 +1,187 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from disagree.metrics import Krippendorff
+from disagree.service import MetricService, fingerprint
+
+test_annotations = {"a": [None, None, None, None, None, 2, 3, 0, 1, 0, 0, 2, 2, None, 2],
+                    "b": [0, None, 1, 0, 2, 2, 3, 2, None, None, None, None, None, None, None],
+                    "c": [None, None, 1, 0, 2, 3, 3, None, 1, 0, 0, 2, 2, None, 3]}
+df_test = pd.DataFrame(test_annotations)
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    # Thread pool that records how many jobs were submitted
+    def __init__(self):
+        super().__init__(max_workers=2)
+        self.submitted = 0
+
+    def submit(self, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(*args, **kwargs)
+
+
+class Counter():
+    # Slow metric that records how many times it was computed
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, df, value=0):
+        with self.lock:
+            self.calls += 1
+        time.sleep(0.05)
+        if value is None:
+            raise ValueError("bad value")
+        return value
+
+
+class TestMetricService(unittest.TestCase):
+    """
+    Tests for disagree.service.MetricService
+    """
+    def test_fingerprint(self):
+        self.assertEqual(fingerprint(df_test), fingerprint(df_test.copy()))
+
+        changed = df_test.copy()
+        changed.loc[0, "a"] = 1
+        self.assertNotEqual(fingerprint(df_test), fingerprint(changed))
+
+        renamed = df_test.rename(columns={"a": "z"})
+        self.assertNotEqual(fingerprint(df_test), fingerprint(renamed))
+
+    def test_fingerprint_distinguishes_label_types(self):
+        # 1 and "1" are different labels, with different alphas
+        a = pd.DataFrame({"x": [1, "1", 2, 2], "y": ["1", "1", 2, 2]})
+        b = pd.DataFrame({"x": ["1", "1", 2, 2], "y": ["1", "1", 2, 2]})
+        self.assertNotEqual(fingerprint(a), fingerprint(b))
+
+        service = MetricService()
+
+        async def run():
+            await service.alpha(b)
+            return await service.alpha(a)
+
+        self.assertEqual(asyncio.run(run()), Krippendorff(a).alpha())
+
+    def test_fingerprint_numeric(self):
+        numeric = df_test.astype(float)
+        self.assertEqual(fingerprint(numeric), fingerprint(numeric.copy()))
+        self.assertNotEqual(fingerprint(numeric), fingerprint(numeric.astype("float32")))
+
+        changed = numeric.copy()
+        changed.iloc[5, 0] = 1.
+        self.assertNotEqual(fingerprint(numeric), fingerprint(changed))
+
+    def test_in_place_modification_changes_result(self):
+        df = df_test.astype(float)
+        service = MetricService()
+
+        async def run():
+            before = await service.alpha(df)
+            df.iloc[:8, :] = 0.
+            after = await service.alpha(df)
+            return before, after
+
+        before, after = asyncio.run(run())
+        self.assertEqual(before, Krippendorff(df_test).alpha())
+        self.assertEqual(after, Krippendorff(df).alpha())
+        self.assertNotEqual(before, after)
+
+    def test_cache_hits_skip_computation(self):
+        executor = CountingExecutor()
+        service = MetricService(executor=executor)
+
+        async def run():
+            await service.alpha(df_test)
+            await service.alpha(df_test)
+
+        asyncio.run(run())
+        executor.shutdown()
+        # fingerprint + computation, then only the fingerprint
+        self.assertEqual(executor.submitted, 3)
+        self.assertEqual(service.cache_info()["hits"], 1)
+
+    def test_trust_identity_skips_executor(self):
+        executor = CountingExecutor()
+        service = MetricService(executor=executor, trust_identity=True)
+
+        async def run():
+            await service.alpha(df_test)
+            await service.alpha(df_test)
+
+        asyncio.run(run())
+        executor.shutdown()
+        # fingerprint + computation, then nothing for the repeated request
+        self.assertEqual(executor.submitted, 2)
+        self.assertEqual(service.cache_info()["hits"], 1)
+
+    def test_alpha_matches_krippendorff(self):
+        service = MetricService()
+        alpha = asyncio.run(service.alpha(df_test, data_type="interval"))
+        self.assertEqual(alpha, Krippendorff(df_test).alpha(data_type="interval"))
+
+    def test_repeated_requests_are_cached(self):
+        service = MetricService()
+        counter = Counter()
+
+        async def run():
+            first = await service.compute(df_test, "count", counter, value=1)
+            second = await service.compute(df_test.copy(), "count", counter, value=1)
+            other = await service.compute(df_test, "count", counter, value=2)
+            return first, second, other
+
+        self.assertEqual(asyncio.run(run()), (1, 1, 2))
+        self.assertEqual(counter.calls, 2)
+        self.assertEqual(service.cache_info()["hits"], 1)
+
+    def test_concurrent_requests_are_deduplicated(self):
+        service = MetricService()
+        counter = Counter()
+
+        async def run():
+            return await asyncio.gather(*[service.compute(df_test, "count", counter, value=1)
+                                          for _ in range(5)])
+
+        self.assertEqual(asyncio.run(run()), [1] * 5)
+        self.assertEqual(counter.calls, 1)
+
+    def test_lru_eviction(self):
+        service = MetricService(max_size=2)
+        counter = Counter()
+
+        async def run():
+            for value in (1, 2, 1, 3, 1, 2):
+                await service.compute(df_test, "count", counter, value=value)
+
+        asyncio.run(run())
+        # 1, 2 computed; 1 hit; 3 evicts 2; 1 hit; 2 recomputed
+        self.assertEqual(counter.calls, 4)
+        self.assertEqual(service.cache_info()["size"], 2)
+
+    def test_errors_are_not_cached(self):
+        service = MetricService()
+        counter = Counter()
+
+        async def run():
+            for _ in range(2):
+                with self.assertRaises(ValueError):
+                    await service.compute(df_test, "count", counter, value=None)
+
+        asyncio.run(run())
+        self.assertEqual(counter.calls, 2)
+        self.assertEqual(service.cache_info()["size"], 0)
+
+    def test_invalid_max_size(self):
+        with self.assertRaises(ValueError):
+            MetricService(max_size=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
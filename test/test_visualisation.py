@@ -4,13 +4,14 @@ import sys
 
 import pandas as pd
 
-from disagree import agreements
+from disagree import agreements, kernels
 
 test_annotations = {"a": [None, None, None, None, None, 1, 3, 0, 1, 0, 0, 2, 2, None, 2],
                     "b": [0, None, 1, 0, 2, 2, 3, 2, None, None, None, None, None, None, None],
                     "c": [None, None, 1, 0, 2, 3, 3, None, 1, 0, 0, 2, 2, None, 3]}
 df = pd.DataFrame(test_annotations)
 instance = agreements.BiDisagreements(df)
+instance_lean = agreements.BiDisagreements(df, low_memory=True)
 
 
 class TestBiDisagreements(unittest.TestCase):
@@ -39,5 +40,23 @@ class TestBiDisagreements(unittest.TestCase):
         self.assertTrue(mat[0][2] == 1. and mat[2][0] == 1. and mat[2][3] == 1. and mat[3][2] == 1.)
 
 
+    def test_low_memory_matches(self):
+        self.assertEqual(instance_lean.agreements_summary(),
+                         agreements.BiDisagreements(df).agreements_summary())
+        mat = agreements.BiDisagreements(df).agreements_matrix()
+        self.assertTrue((instance_lean.agreements_matrix() == mat).all())
+        self.assertFalse(hasattr(instance_lean, "df"))
+
+    def test_chunked_summary_matches(self):
+        # Summary built a few instances at a time gives the same counts
+        chunk_size = kernels.CHUNK_SIZE
+        kernels.CHUNK_SIZE = 4
+        try:
+            summary = instance_lean.agreements_summary()
+        finally:
+            kernels.CHUNK_SIZE = chunk_size
+        self.assertEqual(summary, (9, 2, 1, 0))
+
+
 if __name__ == "__main__":
     unittest.main()